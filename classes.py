@@ -1,8 +1,11 @@
 import csv
 from dataclasses import dataclass
+from typing import Optional
 
 from plotly.express import scatter
 
+import name_matching
+
 
 ###############################################################################
 # Part 1(a)
@@ -223,7 +226,8 @@ class CombinedRateData:
 
 def combine_rates(hypertension_data: list[HypertensionData],
                   low_income_data: list[LowIncomeData],
-                  age_group: str) -> list[CombinedRateData]:
+                  age_group: str,
+                  name_cache_file: Optional[str] = None) -> list[CombinedRateData]:
     """Return a list of CombinedRateData values for the neighbourhoods in both hypertension_data and low_income_data.
 
     The age_group parameter determines what age group to calculate hypertension rates for. It has the same
@@ -237,6 +241,9 @@ def combine_rates(hypertension_data: list[HypertensionData],
     or have a particular order. If a neighbourhood appears in one of the input lists but not the other,
     that neighbourhood should NOT be included in the returned list.
 
+    Neighbourhood names are matched between the two datasets using name_matching, one-to-one. If
+    name_cache_file is given, the resolved name mapping is cached in that file and reused by later calls.
+
     Preconditions:
     - neighbourhood names in hypertension_data are unique
     - neighbourhood names in low_income_data are unique
@@ -255,17 +262,21 @@ def combine_rates(hypertension_data: list[HypertensionData],
     2. Remember that you can check whether a given value k is a key in a dictionary using the "in" operator.
     """
 
+    low_income_rate = get_low_income_rates(low_income_data)
+    hypertension_rate = get_hypertension_rates(hypertension_data, age_group)
+
+    # The two datasets don't always spell neighbourhood names identically (punctuation, hyphens, etc.),
+    # so match them through an index rather than by comparing every pair of names.
+    matches = name_matching.resolve_names(list(hypertension_rate), list(low_income_rate),
+                                           cache_file=name_cache_file)
+
     data = []
     for h in hypertension_data:
-        for low_inc in low_income_data:
-            if h.name in low_inc.name:
-                same_name = low_inc.name
-                low_income_rate = get_low_income_rates(low_income_data)
-                hypertension_rate = get_hypertension_rates(hypertension_data, age_group)
-
-                combo_data = CombinedRateData(name=same_name, hypertension_rate=hypertension_rate[same_name],
-                                              low_income_rate=low_income_rate[same_name])
-                data.append(combo_data)
+        same_name = matches[h.name].matched_name
+        if same_name is not None:
+            combo_data = CombinedRateData(name=same_name, hypertension_rate=hypertension_rate[h.name],
+                                          low_income_rate=low_income_rate[same_name])
+            data.append(combo_data)
 
     return data
 
@@ -347,5 +358,5 @@ if __name__ == '__main__':
         'max-line-length': 120,
         'disable': ['too-many-instance-attributes'],
         'allowed-io': ['load_hypertension_data', 'load_low_income_data'],
-        'extra-imports': ['csv', 'plotly.express'],
+        'extra-imports': ['csv', 'plotly.express', 'name_matching'],
     })
@@ -1,6 +1,7 @@
 import random
 
 import a3_helpers
+import point_rules
 
 
 ###############################################################################
@@ -136,14 +137,12 @@ def generate_point_sequence2(vertex_points: list[tuple[int, int]],
 
       For example, if we have five vertices [v_0, v_1, v_2, v_3, v_4], and the current vertex is v_1,
       we can add either 2 or 3 to the index to obtain v_3 or v_4.
+
+    The restriction is compiled into a transition table (see point_rules.py), so each point costs
+    one table lookup and one random draw.
     """
-    sequence_so_far = [initial_point]
-    for _ in range(0, num_points - 1):
-        random_vertex = random.randint(0, len(vertex_points) - 1)
-        calculate_midpoints = ((initial_point[0] + vertex_points[random_vertex][0]) // 2,
-                               (initial_point[1] + vertex_points[random_vertex][1]) // 2)
-        sequence_so_far.append(calculate_midpoints)
-    return sequence_so_far
+    table = point_rules.compile_rule(point_rules.AVOID_PREVIOUS_AND_NEIGHBOURS, len(vertex_points))
+    return point_rules.generate_points(table, vertex_points, initial_point, num_points)
 
 
 def draw_point_sequence2(
@@ -176,18 +175,17 @@ def draw_point_sequence2(
        This will allow you to draw a very large number of points (e.g., one million) without needing to
        store all of them. Plus, good practice with for loop patterns!
     2. That said, your implementation should be similar to generate_point_sequence2, and in particular use
-       random.randint in the same way.
+       the same compiled transition table. point_rules.iter_points yields the points one at a time, so
+       they are drawn without being stored.
     3. Your implementation should also have the same structure as part3_warmup (particuarly the pygame parts).
     4. Like part3_warmup, you can choose any colours you want, but the points must all be visible on the screen
        (so avoid white or very light colours).
     """
     screen = a3_helpers.initialize_pygame_window(screen_width, screen_height)
 
-    for _ in range(0, num_points - 1):
-        random_vertex = random.randint(0, len(vertex_points) - 1)
-        calculate_midpoints = ((initial_point[0] + vertex_points[random_vertex][0]) // 2,
-                               (initial_point[1] + vertex_points[random_vertex][1]) // 2)
-        a3_helpers.draw_pixel(screen, calculate_midpoints, (255, 105, 180))
+    table = point_rules.compile_rule(point_rules.AVOID_PREVIOUS_AND_NEIGHBOURS, len(vertex_points))
+    for point in point_rules.iter_points(table, vertex_points, initial_point, num_points):
+        a3_helpers.draw_pixel(screen, point, (255, 105, 180))
 
     a3_helpers.wait_for_pygame_exit()
 
@@ -254,16 +252,22 @@ def user_pattern(screen_width: int, screen_height: int, num_vertices: int, seque
           This is the same function you were introduced to in Tutorial 5.
     """
     screen = a3_helpers.initialize_pygame_window(screen_width, screen_height)
-    for _ in range(0, num_vertices + 1):
-        points = a3_helpers.input_mouse_pygame()
-        initial_point = (0, 0)
 
-        if sequence_type in (1, 2):
-            for _ in range(0, num_points - 1):
-                random_vertex = random.randint(0, len(points) - 1)
-                calculate_midpoints = ((initial_point[0] + points[random_vertex][0]) // 2,
-                                       (initial_point[1] + points[random_vertex][1]) // 2)
-                a3_helpers.draw_pixel(screen, calculate_midpoints, (255, 105, 180))
+    vertex_points = [a3_helpers.input_mouse_pygame() for _ in range(0, num_vertices)]
+    initial_point = a3_helpers.input_mouse_pygame()
+
+    if sequence_type == 1:
+        # Drawn the same way as draw_point_sequence1
+        for _ in range(0, num_points - 1):
+            random_vertex = random.randint(0, len(vertex_points) - 1)
+            calculate_midpoints = ((initial_point[0] + vertex_points[random_vertex][0]) // 2,
+                                   (initial_point[1] + vertex_points[random_vertex][1]) // 2)
+            a3_helpers.draw_pixel(screen, calculate_midpoints, (255, 105, 180))
+    else:
+        # Drawn the same way as draw_point_sequence2
+        table = point_rules.compile_rule(point_rules.AVOID_PREVIOUS_AND_NEIGHBOURS, num_vertices)
+        for point in point_rules.iter_points(table, vertex_points, initial_point, num_points):
+            a3_helpers.draw_pixel(screen, point, (255, 105, 180))
 
     a3_helpers.wait_for_pygame_exit()
 
@@ -275,5 +279,5 @@ if __name__ == '__main__':
 
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ['random', 'a3_helpers'],
+        'extra-imports': ['random', 'a3_helpers', 'point_rules'],
     })
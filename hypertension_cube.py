@@ -0,0 +1,221 @@
+"""Hypertension totals and rates rolled up by custom groupings of neighbourhoods.
+
+A HypertensionCube precomputes the (# people with hypertension, # people) sums for every
+(group, age group) combination, so that rollup and drill-down queries are dictionary lookups.
+The per-neighbourhood sums are computed from the data only once: regrouping the same data
+(e.g., from wards to income quintiles) reuses them instead of rescanning the rows.
+"""
+from typing import Iterable, Optional
+
+import name_matching
+from classes import HypertensionData, LowIncomeData
+
+# The (hypertension count, population) attributes of HypertensionData for each age group
+AGE_GROUP_ATTRIBUTES = {
+    '20+': ('num_hypertension_all', 'num_all'),
+    '20-44': ('num_hypertension_20_44', 'num_20_44'),
+    '45-64': ('num_hypertension_45_64', 'num_45_64'),
+    '65+': ('num_hypertension_65_plus', 'num_65_plus'),
+}
+
+
+def neighbourhood_sums(data: list[HypertensionData]) -> dict[str, dict[str, tuple[int, int]]]:
+    """Return a mapping from each neighbourhood name to its (hypertension count, population) by age group.
+
+    Preconditions:
+    - data does not contain any duplicated neighbourhood names
+
+    >>> row = HypertensionData('Woburn', 12981, 56779, 1267, 20139, 5593, 14439, 6121, 8052)
+    >>> neighbourhood_sums([row])['Woburn']['65+']
+    (6121, 8052)
+    """
+    return {row.name: {age_group: (getattr(row, count), getattr(row, population))
+                       for age_group, (count, population) in AGE_GROUP_ATTRIBUTES.items()}
+            for row in data}
+
+
+class HypertensionCube:
+    """Hypertension sums for every (group, age group) combination of a grouping of neighbourhoods.
+
+    Neighbourhoods that are not in the grouping are left out of every group, but still count
+    towards the city-wide rollup.
+
+    Instance Attributes:
+        - grouping: a mapping from each grouped neighbourhood name to the name of its group
+
+    >>> data = [HypertensionData('A', 10, 100, 1, 50, 3, 30, 6, 20),
+    ...         HypertensionData('B', 20, 100, 2, 50, 6, 30, 12, 20),
+    ...         HypertensionData('C', 30, 100, 3, 50, 9, 30, 18, 20)]
+    >>> cube = HypertensionCube(neighbourhood_sums(data), {'A': 'east', 'B': 'east', 'C': 'west'})
+    >>> cube.total('east', '65+')
+    18
+    >>> cube.rate('east', '20+')
+    0.15
+    >>> cube.drill_down('east', '45-64')
+    {'A': (3, 30), 'B': (6, 30)}
+    >>> cube.rollup('20+')
+    (60, 300)
+    >>> cube.regroup({'A': 'north', 'C': 'north'}).total('north', '20-44')
+    4
+    """
+    grouping: dict[str, str]
+    # Private Instance Attributes:
+    #   - _partials: the per-neighbourhood sums, as returned by neighbourhood_sums
+    #   - _sums: a mapping from each (group, age group) to its (hypertension count, population) sums
+    #   - _members: a mapping from each (group, age group) to the sums of each neighbourhood in the group
+    #   - _city: a mapping from each age group to the city-wide (hypertension count, population) sums
+    _partials: dict[str, dict[str, tuple[int, int]]]
+    _sums: dict[tuple[str, str], tuple[int, int]]
+    _members: dict[tuple[str, str], dict[str, tuple[int, int]]]
+    _city: dict[str, tuple[int, int]]
+
+    def __init__(self, partials: dict[str, dict[str, tuple[int, int]]], grouping: dict[str, str]) -> None:
+        """Initialize a cube over the given per-neighbourhood sums, grouped by grouping.
+
+        The names in grouping are matched to the neighbourhood names in partials after
+        normalization (see name_matching.normalize_name), so the grouping may come from a dataset
+        that differs in case, punctuation or hyphens. Fuzzy matches are not accepted, since a
+        misspelled grouping name must not silently roll up another neighbourhood's sums.
+
+        Raise ValueError if a name in grouping matches no neighbourhood exactly, or matches the
+        same neighbourhood as another name in grouping.
+
+        >>> data = [HypertensionData('Rexdale-Kipling', 10, 100, 1, 50, 3, 30, 6, 20)]
+        >>> HypertensionCube(neighbourhood_sums(data), {'Rexdale-Kipling': 'a', 'Rexdale Kipling': 'b'})
+        Traceback (most recent call last):
+        ...
+        ValueError: grouping names matching the same neighbourhood as another name: ['Rexdale Kipling']
+        >>> HypertensionCube(neighbourhood_sums(data), {'Rexdale': 'a'})
+        Traceback (most recent call last):
+        ...
+        ValueError: grouping names matching no neighbourhood: ['Rexdale']
+        >>> HypertensionCube(neighbourhood_sums(data), {'Rexdale-Kiplin': 'a'})
+        Traceback (most recent call last):
+        ...
+        ValueError: grouping names matching a neighbourhood only approximately: ['Rexdale-Kiplin']
+        """
+        self._partials = partials
+        matches = name_matching.resolve_names(list(grouping), list(partials))
+        unmatched = [name for name in grouping if matches[name].matched_name is None]
+        if unmatched:
+            # resolve_names matches one-to-one, so tell apart the names that lost a
+            # neighbourhood to another grouping name from those that match nothing at all
+            index = name_matching.NameIndex(list(partials))
+            conflicting = [name for name in unmatched if index.match(name).matched_name is not None]
+            if conflicting:
+                raise ValueError(f'grouping names matching the same neighbourhood as another name: {conflicting}')
+            raise ValueError(f'grouping names matching no neighbourhood: {unmatched}')
+
+        approximate = [name for name in grouping if matches[name].confidence < 1.0]
+        if approximate:
+            raise ValueError(f'grouping names matching a neighbourhood only approximately: {approximate}')
+
+        self.grouping = {matches[name].matched_name: group for name, group in grouping.items()}
+
+        self._members = {}
+        for name, group in self.grouping.items():
+            for age_group, sums in partials[name].items():
+                self._members.setdefault((group, age_group), {})[name] = sums
+
+        self._sums = {key: _add_sums(members.values()) for key, members in self._members.items()}
+        self._city = {age_group: _add_sums(sums[age_group] for sums in partials.values())
+                      for age_group in AGE_GROUP_ATTRIBUTES}
+
+    def regroup(self, grouping: dict[str, str]) -> 'HypertensionCube':
+        """Return a new cube over the same neighbourhoods, grouped by grouping instead."""
+        return HypertensionCube(self._partials, grouping)
+
+    def groups(self) -> set[str]:
+        """Return the names of the groups in this cube."""
+        return set(self.grouping.values())
+
+    def total(self, group: str, age_group: str) -> int:
+        """Return the number of people in the given age group with hypertension in the given group.
+
+        Preconditions:
+        - group in self.groups()
+        - age_group in {'20+', '20-44', '45-64', '65+'}
+        """
+        return self._sums[(group, age_group)][0]
+
+    def rate(self, group: str, age_group: str) -> float:
+        """Return the hypertension rate of the people in the given age group in the given group.
+
+        Preconditions:
+        - group in self.groups()
+        - age_group in {'20+', '20-44', '45-64', '65+'}
+        """
+        count, population = self._sums[(group, age_group)]
+        return count / population
+
+    def rollup(self, age_group: str) -> tuple[int, int]:
+        """Return the city-wide (hypertension count, population) sums for the given age group.
+
+        Preconditions:
+        - age_group in {'20+', '20-44', '45-64', '65+'}
+        """
+        return self._city[age_group]
+
+    def drill_down(self, group: str, age_group: str) -> dict[str, tuple[int, int]]:
+        """Return a mapping from each neighbourhood in group to its (hypertension count, population)
+        sums for the given age group.
+
+        The returned dictionary is shared with this cube and must not be mutated.
+
+        Preconditions:
+        - group in self.groups()
+        - age_group in {'20+', '20-44', '45-64', '65+'}
+        """
+        return self._members[(group, age_group)]
+
+
+def _add_sums(sums: Iterable[tuple[int, int]]) -> tuple[int, int]:
+    """Return the elementwise sum of the given (hypertension count, population) pairs."""
+    count_so_far, population_so_far = 0, 0
+    for count, population in sums:
+        count_so_far += count
+        population_so_far += population
+    return count_so_far, population_so_far
+
+
+def build_cube(data: list[HypertensionData], grouping: dict[str, str]) -> HypertensionCube:
+    """Return a HypertensionCube of the given data, grouped by grouping.
+
+    Preconditions:
+    - data does not contain any duplicated neighbourhood names
+    """
+    return HypertensionCube(neighbourhood_sums(data), grouping)
+
+
+def income_quintile_grouping(data: list[LowIncomeData], labels: Optional[list[str]] = None) -> dict[str, str]:
+    """Return a mapping from each neighbourhood name in data to its low income rate quintile.
+
+    The first quintile has the lowest low income rates. The quintiles are labelled 'Q1' to 'Q5'
+    unless five labels are given.
+
+    Preconditions:
+    - data does not contain any duplicated neighbourhood names
+    - labels is None or len(labels) == 5
+
+    >>> data = [LowIncomeData(name, low, 100) for name, low in zip('ABCDEFGHIJ', range(10, 0, -1))]
+    >>> grouping = income_quintile_grouping(data)
+    >>> grouping['J'], grouping['A']
+    ('Q1', 'Q5')
+    """
+    if labels is None:
+        labels = ['Q1', 'Q2', 'Q3', 'Q4', 'Q5']
+
+    ranked = sorted(data, key=lambda row: row.num_low_income / row.population_total)
+    return {row.name: labels[rank * 5 // len(ranked)] for rank, row in enumerate(ranked)}
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['typing', 'name_matching', 'classes'],
+    })
@@ -0,0 +1,204 @@
+"""A load test for query_service.py.
+
+Starts the query service in a separate process, then drives it from many concurrent keep-alive
+connections for a fixed duration and reports the sustained number of requests per second.
+Optionally, the source csv files are rewritten throughout the run, to check that hot reloads
+do not cause any failed responses or dropped connections.
+"""
+import asyncio
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+QUERIES = [
+    '/total_num_hypertension',
+    '/high_hypertension_rate?threshold=0.24',
+    '/get_hypertension_rates?age_group=65%2B',
+    '/get_hypertension_rates?age_group=20-44',
+    '/combine_rates?age_group=20%2B',
+    '/combine_rates?age_group=45-64',
+]
+
+# The versions of each source file cycled through when rewriting the files during a run
+HYPERTENSION_VERSIONS = ['data/hypertension_data_2016.csv', 'data/hypertension_data_small.csv']
+LOW_INCOME_VERSIONS = ['data/low_income_data_2016.csv', 'data/low_income_data_small.csv']
+
+
+@dataclass
+class LoadTestResult:
+    """A data class representing the outcome of a load test run.
+
+    Instance Attributes:
+        - elapsed: the length of the run, in seconds
+        - num_ok: the number of 200 responses received
+        - num_failed: the number of non-200 responses received
+        - num_closed: the number of connections that closed (or could not be opened) before the run ended
+        - num_rewrites: the number of times the source files were rewritten during the run
+        - totals_seen: the distinct /total_num_hypertension response bodies received, i.e. the data
+          versions the service answered from
+
+    Representation Invariants:
+    - self.elapsed > 0
+    """
+    elapsed: float
+    num_ok: int = 0
+    num_failed: int = 0
+    num_closed: int = 0
+    num_rewrites: int = 0
+    totals_seen: set[bytes] = field(default_factory=set)
+
+
+async def _client(host: str, port: int, deadline: float, offset: int, result: LoadTestResult) -> None:
+    """Send requests over a single keep-alive connection until deadline or until the server closes it,
+    recording the outcomes in result."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        result.num_closed += 1
+        return
+
+    for query in itertools.islice(itertools.cycle(QUERIES), offset, None):
+        if time.perf_counter() >= deadline:
+            break
+        try:
+            writer.write(f'GET {query} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError
+            content_length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b''):
+                    break
+                if header.lower().startswith(b'content-length:'):
+                    content_length = int(header.split(b':')[1])
+            body = await reader.readexactly(content_length)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The server closed the connection; stop this client
+            result.num_closed += 1
+            break
+
+        if status_line.split()[1] == b'200':
+            result.num_ok += 1
+            if query == '/total_num_hypertension':
+                result.totals_seen.add(body)
+        else:
+            result.num_failed += 1
+    writer.close()
+
+
+async def _rewrite_files(targets: list[tuple[str, list[str]]], interval: float, deadline: float,
+                         result: LoadTestResult) -> None:
+    """Every interval seconds until deadline, replace each target file with the next of its versions.
+
+    Each file is replaced by renaming a complete copy over it, the way a deployment would.
+    """
+    for version in itertools.count(1):
+        await asyncio.sleep(interval)
+        if time.perf_counter() >= deadline:
+            break
+        for target, versions in targets:
+            temporary = target + '.tmp'
+            shutil.copyfile(versions[version % len(versions)], temporary)
+            os.replace(temporary, target)
+        result.num_rewrites += 1
+
+
+async def run_load_test(host: str = '127.0.0.1', port: int = 8110,
+                        num_connections: int = 50, duration: float = 5.0,
+                        rewrites: Optional[list[tuple[str, list[str]]]] = None,
+                        rewrite_interval: float = 0.5) -> LoadTestResult:
+    """Drive the query service at host:port with num_connections concurrent clients for duration seconds,
+    and return the outcome.
+
+    If rewrites is given, each (target file, versions) pair in it has its target replaced by the next
+    of its versions every rewrite_interval seconds during the run.
+
+    Preconditions:
+    - a QueryService is already serving on host:port
+    - num_connections >= 1
+    - duration > 0
+    - rewrite_interval > 0
+    """
+    start = time.perf_counter()
+    deadline = start + duration
+    result = LoadTestResult(elapsed=duration)
+
+    tasks = [_client(host, port, deadline, i, result) for i in range(num_connections)]
+    if rewrites is not None:
+        tasks.append(_rewrite_files(rewrites, rewrite_interval, deadline, result))
+    await asyncio.gather(*tasks)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _wait_for_port(host: str, port: int, timeout: float) -> None:
+    """Block until a server accepts connections on host:port, or raise TimeoutError after timeout seconds."""
+    async def attempt() -> None:
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            asyncio.run(attempt())
+            return
+        except OSError:
+            if time.perf_counter() >= deadline:
+                raise TimeoutError(f'query service did not start on {host}:{port}') from None
+            time.sleep(0.1)
+
+
+def main(num_connections: int = 50, duration: float = 5.0, port: int = 8110,
+         rewrite_interval: Optional[float] = None) -> None:
+    """Start the query service in a subprocess, load test it, and print the result.
+
+    If rewrite_interval is given, the service serves copies of the datasets that are replaced with
+    a different version every rewrite_interval seconds during the run, so the service hot reloads
+    while it is under load.
+
+    Preconditions:
+    - num_connections >= 1
+    - duration > 0
+    - rewrite_interval is None or rewrite_interval > 0
+    """
+    hypertension_file, low_income_file = HYPERTENSION_VERSIONS[0], LOW_INCOME_VERSIONS[0]
+    rewrites = None
+    poll_interval = 1.0
+    if rewrite_interval is not None:
+        directory = tempfile.mkdtemp()
+        hypertension_file = shutil.copy(hypertension_file, directory)
+        low_income_file = shutil.copy(low_income_file, directory)
+        rewrites = [(hypertension_file, HYPERTENSION_VERSIONS), (low_income_file, LOW_INCOME_VERSIONS)]
+        poll_interval = rewrite_interval / 5
+
+    server = subprocess.Popen([sys.executable, '-c',
+                               'import query_service; query_service.run_service('
+                               f'{hypertension_file!r}, {low_income_file!r}, port={port}, '
+                               f'poll_interval={poll_interval})'])
+    try:
+        _wait_for_port('127.0.0.1', port, timeout=10.0)
+        result = asyncio.run(run_load_test('127.0.0.1', port, num_connections, duration,
+                                           rewrites, rewrite_interval or 1.0))
+        print(f'{num_connections} connections for {duration}s: '
+              f'{result.num_ok / result.elapsed:,.0f} successful requests/second')
+        print(f'non-200 responses: {result.num_failed}, connections closed early: {result.num_closed}')
+        if rewrites is not None:
+            print(f'source files rewritten {result.num_rewrites} times; '
+                  f'responses came from {len(result.totals_seen)} distinct data versions')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Matching neighbourhood names between datasets that don't spell them identically.
+
+Names are first normalized (case, accents, punctuation, hyphens and stray byte order marks are
+all ignored), so most matches are found with a single dictionary lookup. Names without an exact
+normalized match are compared only against the candidates that share at least one character
+trigram with them, found through an inverted index, instead of against every candidate.
+"""
+import json
+import os
+import tempfile
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+# Fuzzy matches must have a trigram similarity strictly above this. The most similar pair of
+# distinct neighbourhoods in the 2016 datasets ('Mount Pleasant East' and 'Mount Pleasant West')
+# scores 0.8, while a one-letter typo in a long name scores above 0.9.
+DEFAULT_MIN_CONFIDENCE = 0.85
+
+# Each word of a fuzzy match must have at least this trigram similarity with the word in the
+# same position of the other name, so that names differing by a whole word (e.g. 'East' vs.
+# 'West') are never matched, however similar the rest of the names are.
+MIN_WORD_CONFIDENCE = 0.5
+
+
+@dataclass
+class NameMatch:
+    """A data class representing the result of matching one name against an index of names.
+
+    Instance Attributes:
+        - name: the name that was looked up
+        - matched_name: the indexed name it was matched with, or None if there was no acceptable match
+        - confidence: how similar the two names are, from 0.0 (nothing in common) to 1.0 (same normalized name)
+
+    Representation Invariants:
+    - 0.0 <= self.confidence <= 1.0
+    - self.matched_name is not None or self.confidence == 0.0
+    """
+    name: str
+    matched_name: Optional[str]
+    confidence: float
+
+
+def normalize_name(name: str) -> str:
+    """Return a normalized key for the given neighbourhood name.
+
+    >>> normalize_name('\\ufeffThistletown-Beaumond  Heights')
+    'thistletown beaumond heights'
+    >>> normalize_name('Mount Olive - Silverstone') == normalize_name('Mount Olive-Silverstone')
+    True
+    >>> normalize_name('Côte-des-Neiges')
+    'cote des neiges'
+    """
+    decomposed = unicodedata.normalize('NFKD', name.replace('\ufeff', '')).casefold()
+    characters = [' ' if not c.isalnum() else c for c in decomposed if not unicodedata.combining(c)]
+    return ' '.join(''.join(characters).split())
+
+
+def _trigrams(key: str) -> set[str]:
+    """Return the set of character trigrams of the given normalized key, padded with spaces at both ends."""
+    padded = f' {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(grams1: set[str], grams2: set[str]) -> float:
+    """Return the Dice coefficient of the two given trigram sets."""
+    return 2 * len(grams1 & grams2) / (len(grams1) + len(grams2))
+
+
+def _same_words(key1: str, key2: str) -> bool:
+    """Return whether the two normalized keys have the same number of words, and each word is similar
+    to the word in the same position of the other key.
+
+    >>> _same_words('mount olive silverston', 'mount olive silverstone')
+    True
+    >>> _same_words('mount pleasant east', 'mount pleasant west')
+    False
+    >>> _same_words('woburn', 'woburn north')
+    False
+    """
+    words1, words2 = key1.split(), key2.split()
+    return len(words1) == len(words2) and all(
+        word1 == word2 or _dice(_trigrams(word1), _trigrams(word2)) >= MIN_WORD_CONFIDENCE
+        for word1, word2 in zip(words1, words2))
+
+
+class NameIndex:
+    """An index over a collection of names supporting exact and fuzzy lookups.
+
+    Instance Attributes:
+        - names: the indexed names, in the order they were given
+
+    Representation Invariants:
+    - self.names does not contain duplicates
+    """
+    names: list[str]
+    # Private Instance Attributes:
+    #   - _exact: a mapping from each normalized key to the indexed name it came from
+    #   - _keys: the normalized key of each indexed name, by position in self.names
+    #   - _gram_counts: the number of distinct trigrams of each indexed name, by position in self.names
+    #   - _postings: a mapping from each trigram to the positions of the indexed names containing it
+    _exact: dict[str, str]
+    _keys: list[str]
+    _gram_counts: list[int]
+    _postings: dict[str, list[int]]
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = list(names)
+        self._exact = {}
+        self._keys = []
+        self._gram_counts = []
+        self._postings = {}
+
+        for position, name in enumerate(self.names):
+            key = normalize_name(name)
+            self._exact.setdefault(key, name)
+            self._keys.append(key)
+            grams = _trigrams(key)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+
+    def match(self, name: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> NameMatch:
+        """Return the best match for name among the indexed names.
+
+        The confidence of a fuzzy match is the Dice coefficient of the two names' trigram sets.
+        A fuzzy match is only accepted if its confidence is strictly greater than min_confidence
+        and the two names differ by no whole word; otherwise the returned match has no matched_name.
+
+        Preconditions:
+        - 0.0 <= min_confidence < 1.0
+
+        >>> index = NameIndex(['Woburn North', 'Mount Olive-Silverstone-Jamestown'])
+        >>> index.match('Mount Olive - Silverstone - Jamestown')
+        NameMatch(name='Mount Olive - Silverstone - Jamestown', matched_name='Mount Olive-Silverstone-Jamestown', \
+confidence=1.0)
+        >>> index.match('Woburn').matched_name is None
+        True
+        >>> index.match('Mount Olive-Silverston-Jamestown').matched_name
+        'Mount Olive-Silverstone-Jamestown'
+        >>> NameIndex(['Mount Pleasant West']).match('Mount Pleasant East').matched_name is None
+        True
+        """
+        key = normalize_name(name)
+        if key in self._exact:
+            return NameMatch(name, self._exact[key], 1.0)
+
+        grams = _trigrams(key)
+        shared = Counter(position for gram in grams for position in self._postings.get(gram, []))
+
+        best_position, best_confidence = None, min_confidence
+        for position, count in shared.items():
+            confidence = 2 * count / (len(grams) + self._gram_counts[position])
+            if confidence > best_confidence and _same_words(key, self._keys[position]):
+                best_position, best_confidence = position, confidence
+
+        if best_position is None:
+            return NameMatch(name, None, 0.0)
+        return NameMatch(name, self.names[best_position], best_confidence)
+
+
+def resolve_names(names: list[str], candidates: list[str],
+                  min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                  cache_file: Optional[str] = None) -> dict[str, NameMatch]:
+    """Return a mapping from each name in names to its best match in candidates.
+
+    The matching is one-to-one: if several names match the same candidate, only the one with the
+    highest confidence (or the earliest in names, on ties) keeps the match, and the others are
+    returned with no matched_name.
+
+    If cache_file is given, previously resolved matches stored there are reused, and the
+    resolved mapping is written back to it. Cached matches are only reused if they were resolved
+    against exactly the same candidates with the same min_confidence.
+
+    Preconditions:
+    - candidates does not contain duplicates
+    - 0.0 <= min_confidence < 1.0
+
+    >>> result = resolve_names(['Woburn', 'Rexdale Kipling'], ['Rexdale-Kipling', 'Woburn North'])
+    >>> result['Rexdale Kipling'].matched_name
+    'Rexdale-Kipling'
+    >>> result['Woburn'].matched_name is None
+    True
+    >>> result = resolve_names(['Mount Olive-Silverston-Jamestown', 'Mount Olive-Silverstone-Jamestown'],
+    ...                        ['Mount Olive-Silverstone-Jamestown'])
+    >>> [result[name].matched_name for name in result]
+    [None, 'Mount Olive-Silverstone-Jamestown']
+    """
+    fingerprint = [sorted(candidates), min_confidence]
+    cached = _read_cache(cache_file, fingerprint) if cache_file is not None else {}
+
+    index = None
+    matches = {}
+    for name in names:
+        if name in cached:
+            matches[name] = cached[name]
+        else:
+            if index is None:
+                index = NameIndex(candidates)
+            matches[name] = index.match(name, min_confidence)
+
+    # The cache stores each name's best match on its own, since which name wins a contested
+    # candidate depends on the other names being resolved.
+    if cache_file is not None and index is not None:
+        _write_cache(cache_file, fingerprint, {**cached, **matches})
+
+    return _one_to_one(matches)
+
+
+def _one_to_one(matches: dict[str, NameMatch]) -> dict[str, NameMatch]:
+    """Return a copy of matches in which each matched name is claimed by at most one name.
+
+    The claim with the highest confidence wins; ties go to the claim that comes first in matches.
+    """
+    winners = {}
+    for name, match in matches.items():
+        if match.matched_name is not None:
+            current = winners.get(match.matched_name)
+            if current is None or match.confidence > matches[current].confidence:
+                winners[match.matched_name] = name
+
+    return {name: match if match.matched_name is None or winners[match.matched_name] == name
+            else NameMatch(name, None, 0.0)
+            for name, match in matches.items()}
+
+
+def _read_cache(cache_file: str, fingerprint: list) -> dict[str, NameMatch]:
+    """Return the matches stored in cache_file, or an empty dict if it is missing, unreadable or stale."""
+    if not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            contents = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(contents, dict) or contents.get('fingerprint') != fingerprint \
+            or not isinstance(contents.get('matches'), dict):
+        return {}
+
+    cached = {}
+    for name, entry in contents['matches'].items():
+        if not (isinstance(entry, list) and len(entry) == 2
+                and (entry[0] is None or isinstance(entry[0], str))
+                and isinstance(entry[1], (int, float))):
+            return {}
+        cached[name] = NameMatch(name, entry[0], float(entry[1]))
+    return cached
+
+
+def _write_cache(cache_file: str, fingerprint: list, matches: dict[str, NameMatch]) -> None:
+    """Write the given matches to cache_file, tagged with fingerprint.
+
+    The matches are written to a temporary file that then replaces cache_file, so that readers
+    never see a partially written cache.
+    """
+    contents = {'fingerprint': fingerprint,
+                'matches': {name: [match.matched_name, match.confidence] for name, match in matches.items()}}
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, suffix='.tmp', delete=False) as f:
+        json.dump(contents, f, indent=2, ensure_ascii=False)
+    os.replace(f.name, cache_file)
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['json', 'os', 'tempfile', 'unicodedata', 'collections', 'dataclasses', 'typing'],
+        'allowed-io': ['_read_cache', '_write_cache'],
+    })
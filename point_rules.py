@@ -0,0 +1,222 @@
+"""Vertex restriction rules for point sequences, compiled into transition tables.
+
+A restriction rule says which vertices may NOT be chosen next, given the last few vertex indexes
+chosen so far. For example, "Point Sequence 2" forbids choosing the previous vertex or either of
+its neighbours. Rather than checking a rule every time a vertex is chosen, compile_rule evaluates
+it once for every possible history, so that generating a sequence takes one table lookup and one
+random draw per point, whatever the rule is.
+"""
+import random
+from dataclasses import dataclass
+from typing import Iterator
+
+
+@dataclass(frozen=True)
+class VertexRule:
+    """A data class representing a declarative restriction on the next vertex index of a point sequence.
+
+    A candidate index c is forbidden if, for some (lag, offset) in forbidden_offsets, the index chosen
+    lag steps ago is i and (c - i) is congruent to offset modulo the number of vertices. So for
+    example (1, 0) forbids repeating the previous vertex, and (1, 1) forbids choosing the vertex
+    right after it.
+
+    Instance Attributes:
+        - history: the number of most recently chosen indexes the rule depends on
+        - forbidden_offsets: the (lag, offset) pairs describing which candidates are forbidden
+
+    Representation Invariants:
+    - self.history >= 0
+    - all(1 <= lag <= self.history for lag, _ in self.forbidden_offsets)
+
+    >>> VertexRule(1, frozenset({(2, 0)}))
+    Traceback (most recent call last):
+    ...
+    ValueError: lag 2 of forbidden offset (2, 0) is not between 1 and the rule's history (1)
+    """
+    history: int
+    forbidden_offsets: frozenset[tuple[int, int]]
+
+    def __post_init__(self) -> None:
+        """Raise ValueError if this rule violates its representation invariants, since a badly declared
+        rule would otherwise silently allow every vertex."""
+        if self.history < 0:
+            raise ValueError(f'history must be at least 0, not {self.history}')
+        for lag, offset in sorted(self.forbidden_offsets):
+            if not 1 <= lag <= self.history:
+                raise ValueError(f'lag {lag} of forbidden offset {(lag, offset)} is not between 1 and '
+                                 f"the rule's history ({self.history})")
+
+
+UNRESTRICTED = VertexRule(0, frozenset())
+NO_REPEAT = VertexRule(1, frozenset({(1, 0)}))
+AVOID_PREVIOUS_AND_NEIGHBOURS = VertexRule(1, frozenset({(1, -1), (1, 0), (1, 1)}))
+
+
+@dataclass
+class TransitionTable:
+    """A data class representing a VertexRule compiled for a fixed number of vertices.
+
+    A state encodes the last rule.history chosen indexes as the digits of a base (num_vertices + 1)
+    number, with the most recent index as the least significant digit. The digit num_vertices
+    stands for "no vertex chosen yet", so that the first few choices are only restricted by
+    the indexes that have actually been chosen.
+
+    Instance Attributes:
+        - rule: the rule this table was compiled from
+        - num_vertices: the number of vertices the rule was compiled for
+        - initial_state: the state before any vertex has been chosen
+        - transitions: for each state, the (allowed index, resulting state) pairs
+
+    Representation Invariants:
+    - self.num_vertices >= 1
+    - len(self.transitions) == (self.num_vertices + 1) ** self.rule.history
+    - 0 <= self.initial_state < len(self.transitions)
+    """
+    rule: VertexRule
+    num_vertices: int
+    initial_state: int
+    transitions: list[tuple[tuple[int, int], ...]]
+
+
+def compile_rule(rule: VertexRule, num_vertices: int) -> TransitionTable:
+    """Return the transition table for rule over num_vertices vertices.
+
+    Raise ValueError if the rule leaves no vertex to choose from in some reachable state.
+
+    Preconditions:
+    - num_vertices >= 1
+    - (num_vertices + 1) ** rule.history is small enough to tabulate (e.g., rule.history <= 3)
+
+    >>> table = compile_rule(AVOID_PREVIOUS_AND_NEIGHBOURS, 5)
+    >>> [index for index, _ in table.transitions[1]]
+    [3, 4]
+    >>> compile_rule(AVOID_PREVIOUS_AND_NEIGHBOURS, 3)
+    Traceback (most recent call last):
+    ...
+    ValueError: rule leaves no vertex to choose after the indexes [0]
+    """
+    base = num_vertices + 1
+    num_states = base ** rule.history
+    forbidden = {(lag, offset % num_vertices) for lag, offset in rule.forbidden_offsets}
+
+    transitions = []
+    for state in range(num_states):
+        previous = [(state // base ** (lag - 1)) % base for lag in range(1, rule.history + 1)]
+        allowed = tuple((index, (state * base + index) % num_states)
+                        for index in range(num_vertices)
+                        if not any((lag, (index - chosen) % num_vertices) in forbidden
+                                   for lag, chosen in enumerate(previous, start=1) if chosen != num_vertices))
+        transitions.append(allowed)
+
+    table = TransitionTable(rule, num_vertices, num_states - 1, transitions)
+    _check_reachable_states(table)
+    return table
+
+
+def _check_reachable_states(table: TransitionTable) -> None:
+    """Raise ValueError if any state reachable from table.initial_state has no allowed transitions."""
+    base = table.num_vertices + 1
+    seen = {table.initial_state}
+    reachable = [table.initial_state]
+    # reachable grows while it is being iterated over, visiting the states in breadth-first order
+    for state in reachable:
+        if table.transitions[state] == ():
+            history = [(state // base ** lag) % base for lag in range(table.rule.history)]
+            raise ValueError(f'rule leaves no vertex to choose after the indexes '
+                             f'{[index for index in history if index != table.num_vertices]}')
+        for _, next_state in table.transitions[state]:
+            if next_state not in seen:
+                seen.add(next_state)
+                reachable.append(next_state)
+
+
+def iter_indexes(table: TransitionTable, num_indexes: int) -> Iterator[int]:
+    """Yield a random sequence of num_indexes vertex indexes that follows table's rule, one at a time.
+
+    Preconditions:
+    - num_indexes >= 0
+
+    >>> table = compile_rule(AVOID_PREVIOUS_AND_NEIGHBOURS, 6)
+    >>> indexes = list(iter_indexes(table, 1000))
+    >>> all((b - a) % 6 in {2, 3, 4} for a, b in zip(indexes, indexes[1:]))
+    True
+    """
+    transitions = table.transitions
+    choice = random.choice
+    state = table.initial_state
+    for _ in range(num_indexes):
+        index, state = choice(transitions[state])
+        yield index
+
+
+def generate_indexes(table: TransitionTable, num_indexes: int) -> list[int]:
+    """Return a random sequence of num_indexes vertex indexes that follows table's rule.
+
+    Preconditions:
+    - num_indexes >= 0
+
+    >>> len(generate_indexes(compile_rule(NO_REPEAT, 4), 10))
+    10
+    """
+    return list(iter_indexes(table, num_indexes))
+
+
+def iter_points(table: TransitionTable,
+                vertex_points: list[tuple[int, int]],
+                initial_point: tuple[int, int],
+                num_points: int) -> Iterator[tuple[int, int]]:
+    """Yield a point sequence of length num_points whose vertices are chosen according to table's rule,
+    one point at a time.
+
+    Each point after initial_point is the midpoint (rounded down) of the previous point and the
+    chosen vertex. initial_point is always the first point yielded.
+
+    Preconditions:
+    - len(vertex_points) == table.num_vertices
+    - num_points >= 1
+
+    >>> table = compile_rule(UNRESTRICTED, 1)
+    >>> list(iter_points(table, [(0, 0)], (40, 80), 3))
+    [(40, 80), (20, 40), (10, 20)]
+    """
+    x, y = initial_point
+    yield initial_point
+    for index in iter_indexes(table, num_points - 1):
+        vertex_x, vertex_y = vertex_points[index]
+        x, y = (x + vertex_x) // 2, (y + vertex_y) // 2
+        yield x, y
+
+
+def generate_points(table: TransitionTable,
+                    vertex_points: list[tuple[int, int]],
+                    initial_point: tuple[int, int],
+                    num_points: int) -> list[tuple[int, int]]:
+    """Return a point sequence of length num_points whose vertices are chosen according to table's rule.
+
+    Each point after initial_point is the midpoint (rounded down) of the previous point and the
+    chosen vertex. initial_point is always INCLUDED in the returned point sequence.
+
+    Preconditions:
+    - len(vertex_points) == table.num_vertices
+    - num_points >= 1
+
+    >>> table = compile_rule(UNRESTRICTED, 3)
+    >>> points = generate_points(table, [(0, 0), (100, 0), (0, 100)], (40, 40), 10)
+    >>> len(points)
+    10
+    >>> points[0]
+    (40, 40)
+    """
+    return list(iter_points(table, vertex_points, initial_point, num_points))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['random', 'dataclasses', 'typing'],
+    })
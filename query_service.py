@@ -0,0 +1,331 @@
+"""A local HTTP/JSON service answering the Part 1 queries over datasets kept resident in memory.
+
+Rather than reloading and rejoining the csv files for every query (as part1_example does), this
+service loads the hypertension and low income datasets once, answers queries from memory, and
+caches every response body. A background task watches the source files and, when either changes,
+loads the new data and swaps it in with a single assignment, so in-flight requests always see
+one consistent snapshot.
+
+Supported endpoints (all GET, all returning JSON):
+    - /total_num_hypertension
+    - /high_hypertension_rate?threshold=<float>
+    - /get_hypertension_rates?age_group=<age group>
+    - /combine_rates?age_group=<age group>
+
+Note that '+' in an age group must be percent-encoded in the query string, e.g. age_group=20%2B.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import classes
+
+AGE_GROUPS = {'20+', '20-44', '45-64', '65+'}
+
+_LOGGER = logging.getLogger(__name__)
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+# The largest number of responses cached per snapshot, beyond which the least recently used are evicted
+MAX_CACHED_RESPONSES = 1024
+
+
+@dataclass
+class DataSnapshot:
+    """An immutable-by-convention view of both datasets, together with its response cache.
+
+    The cache lives on the snapshot so that swapping in new data also (atomically) discards
+    every response computed from the old data.
+
+    Instance Attributes:
+        - hypertension_data: the parsed hypertension dataset
+        - low_income_data: the parsed low income dataset
+        - mtimes: the modification times of the hypertension and low income files when they were loaded
+        - cache: a mapping from parsed queries (see parse_query) to encoded response bodies,
+          from least to most recently used
+
+    Representation Invariants:
+    - len(self.cache) <= MAX_CACHED_RESPONSES
+    """
+    hypertension_data: list[classes.HypertensionData]
+    low_income_data: list[classes.LowIncomeData]
+    mtimes: tuple[float, float]
+    cache: OrderedDict[tuple, bytes] = field(default_factory=OrderedDict)
+
+
+class QueryError(Exception):
+    """Raised when a request cannot be answered; carries the HTTP status code to respond with."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def load_snapshot(hypertension_file: str, low_income_file: str) -> DataSnapshot:
+    """Return a new DataSnapshot with the data in the given files.
+
+    Preconditions:
+    - hypertension_file refers to a csv file whose format matches the hypertension dataset description
+    - low_income_file refers to a csv file whose format matches the low income dataset description
+    """
+    # Read the modification times first: if a file changes while it is being loaded, the next
+    # poll sees a newer mtime and reloads it again.
+    mtimes = (os.stat(hypertension_file).st_mtime, os.stat(low_income_file).st_mtime)
+    return DataSnapshot(hypertension_data=classes.load_hypertension_data(hypertension_file),
+                        low_income_data=classes.load_low_income_data(low_income_file),
+                        mtimes=mtimes)
+
+
+def parse_query(path: str, params: dict[str, str]) -> tuple:
+    """Return the query at path with the given params as a (path, validated parameter) tuple.
+
+    Equivalent requests (e.g., threshold=0.24 and threshold=0.240) parse to the same tuple.
+    Raise QueryError if the path is unknown or the parameters are invalid.
+
+    >>> parse_query('/high_hypertension_rate', {'threshold': '0.240'})
+    ('/high_hypertension_rate', 0.24)
+    >>> parse_query('/combine_rates', {})
+    ('/combine_rates', '20+')
+    >>> parse_query('/get_hypertension_rates', {'age_group': '30-40'})
+    Traceback (most recent call last):
+    ...
+    query_service.QueryError: age_group must be one of ['20+', '20-44', '45-64', '65+']
+    """
+    if path == '/total_num_hypertension':
+        return (path,)
+    elif path == '/high_hypertension_rate':
+        try:
+            threshold = float(params['threshold'])
+        except (KeyError, ValueError):
+            raise QueryError(400, 'threshold must be a number between 0.0 and 1.0') from None
+        if not 0.0 <= threshold <= 1.0:
+            raise QueryError(400, 'threshold must be a number between 0.0 and 1.0')
+        return path, threshold
+    elif path in ('/get_hypertension_rates', '/combine_rates'):
+        age_group = params.get('age_group', '20+')
+        if age_group not in AGE_GROUPS:
+            raise QueryError(400, f'age_group must be one of {sorted(AGE_GROUPS)}')
+        return path, age_group
+    else:
+        raise QueryError(404, f'unknown query {path}')
+
+
+def answer_query(snapshot: DataSnapshot, query: tuple) -> object:
+    """Return the JSON-compatible result of the given parsed query over snapshot.
+
+    Preconditions:
+    - query was returned by parse_query
+
+    >>> snapshot = load_snapshot('data/hypertension_data_small.csv', 'data/low_income_data_small.csv')
+    >>> answer_query(snapshot, ('/total_num_hypertension',))
+    23205
+    >>> answer_query(snapshot, ('/high_hypertension_rate', 0.24))
+    ['Rexdale-Kipling', 'Thistletown-Beaumond Heights']
+    """
+    path = query[0]
+    if path == '/total_num_hypertension':
+        return classes.total_num_hypertension(snapshot.hypertension_data)
+    elif path == '/high_hypertension_rate':
+        return sorted(classes.high_hypertension_rate(snapshot.hypertension_data, query[1]))
+    elif path == '/get_hypertension_rates':
+        return classes.get_hypertension_rates(snapshot.hypertension_data, query[1])
+    else:
+        combined = classes.combine_rates(snapshot.hypertension_data, snapshot.low_income_data, query[1])
+        return [asdict(item) for item in combined]
+
+
+class QueryService:
+    """A local HTTP/JSON server for the Part 1 queries.
+
+    Instance Attributes:
+        - hypertension_file: the path of the hypertension csv file being served
+        - low_income_file: the path of the low income csv file being served
+        - poll_interval: the number of seconds between checks for changes to the source files
+        - snapshot: the data currently being served (replaced wholesale on reload)
+
+    Representation Invariants:
+    - self.poll_interval > 0
+    """
+    hypertension_file: str
+    low_income_file: str
+    poll_interval: float
+    snapshot: DataSnapshot
+
+    def __init__(self, hypertension_file: str, low_income_file: str, poll_interval: float = 1.0) -> None:
+        self.hypertension_file = hypertension_file
+        self.low_income_file = low_income_file
+        self.poll_interval = poll_interval
+        self.snapshot = load_snapshot(hypertension_file, low_income_file)
+
+    def respond(self, path: str, params: dict[str, str]) -> tuple[int, bytes]:
+        """Return the HTTP status and JSON body answering the query at path with the given params.
+
+        Successful responses are cached on the current snapshot. Errors are never cached.
+        Unexpected failures are logged, and the client only receives a generic 500 response.
+
+        >>> service = QueryService('data/hypertension_data_small.csv', 'data/low_income_data_small.csv')
+        >>> service.respond('/total_num_hypertension', {})
+        (200, b'23205')
+        >>> service.respond('/high_hypertension_rate', {'threshold': '2'})
+        (400, b'{"error": "threshold must be a number between 0.0 and 1.0"}')
+        >>> service.respond('/unknown', {})
+        (404, b'{"error": "unknown query /unknown"}')
+        >>> service.snapshot.hypertension_data[0].num_all = 0
+        >>> service.respond('/high_hypertension_rate', {'threshold': '0.5'})
+        (500, b'{"error": "internal error"}')
+        >>> len(service.snapshot.cache)
+        1
+        """
+        # Take a single reference so the whole request is answered from one snapshot,
+        # even if a reload swaps self.snapshot in the meantime.
+        snapshot = self.snapshot
+        try:
+            query = parse_query(path, params)
+        except QueryError as error:
+            return error.status, json.dumps({'error': str(error)}).encode()
+
+        body = snapshot.cache.get(query)
+        if body is not None:
+            snapshot.cache.move_to_end(query)
+            return 200, body
+
+        try:
+            result = answer_query(snapshot, query)
+        except Exception:  # Any failure must still produce a response for the client
+            _LOGGER.exception('query %s failed', query)
+            return 500, json.dumps({'error': 'internal error'}).encode()
+
+        body = json.dumps(result).encode()
+        snapshot.cache[query] = body
+        if len(snapshot.cache) > MAX_CACHED_RESPONSES:
+            snapshot.cache.popitem(last=False)
+        return 200, body
+
+    async def reload_if_changed(self) -> bool:
+        """Reload the datasets if either source file's modification time has changed, and return
+        whether a new snapshot was swapped in.
+
+        Loading happens in a worker thread so that requests keep being served from the old
+        snapshot until the new one is ready. If the new files cannot be loaded (e.g., they are
+        only partially written), the old snapshot is kept.
+
+        >>> import shutil, tempfile
+        >>> directory = tempfile.mkdtemp()
+        >>> hypertension_file = shutil.copy('data/hypertension_data_small.csv', directory)
+        >>> service = QueryService(hypertension_file, 'data/low_income_data_small.csv')
+        >>> asyncio.run(service.reload_if_changed())
+        False
+        >>> _ = shutil.copy('data/hypertension_data_2016.csv', hypertension_file)
+        >>> os.utime(hypertension_file, (0, service.snapshot.mtimes[0] + 1))
+        >>> asyncio.run(service.reload_if_changed())
+        True
+        >>> service.respond('/total_num_hypertension', {})
+        (200, b'578215')
+        """
+        try:
+            mtimes = (os.stat(self.hypertension_file).st_mtime, os.stat(self.low_income_file).st_mtime)
+            if mtimes == self.snapshot.mtimes:
+                return False
+            self.snapshot = await asyncio.to_thread(load_snapshot, self.hypertension_file, self.low_income_file)
+            return True
+        except (OSError, ValueError, IndexError, StopIteration):
+            return False
+
+    async def watch_files(self) -> None:
+        """Reload the datasets whenever either source file's modification time changes."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload_if_changed()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    if header.lower().startswith(b'connection:') and b'close' in header.lower():
+                        keep_alive = False
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    body = json.dumps({'error': 'malformed request line'}).encode()
+                    await _write_response(writer, 400, body, keep_alive=False)
+                    break
+                method, target, version = parts
+                if version == 'HTTP/1.0':
+                    keep_alive = False
+
+                if method != 'GET':
+                    status, body = 405, json.dumps({'error': 'only GET is supported'}).encode()
+                else:
+                    url = urlsplit(target)
+                    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                    status, body = self.respond(url.path, params)
+
+                await _write_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8110,
+                    ready: Optional[asyncio.Event] = None) -> None:
+        """Serve queries on host:port until cancelled, reloading the datasets as their files change.
+
+        If ready is given, it is set once the server is accepting connections.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.create_task(self.watch_files())
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool) -> None:
+    """Write an HTTP/1.1 response with the given status and JSON body to writer."""
+    writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                 b'Connection: %s\r\n\r\n%s'
+                 % (status, _REASONS[status].encode(), len(body), b'keep-alive' if keep_alive else b'close', body))
+    await writer.drain()
+
+
+def run_service(hypertension_file: str, low_income_file: str, host: str = '127.0.0.1', port: int = 8110,
+                poll_interval: float = 1.0) -> None:
+    """Run a QueryService over the given files on host:port until interrupted, checking the files for
+    changes every poll_interval seconds.
+
+    Preconditions:
+    - hypertension_file refers to a csv file whose format matches the hypertension dataset description
+    - low_income_file refers to a csv file whose format matches the low income dataset description
+    - poll_interval > 0
+    """
+    service = QueryService(hypertension_file, low_income_file, poll_interval)
+    print(f'Serving Part 1 queries on http://{host}:{port}/')
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    run_service('data/hypertension_data_2016.csv', 'data/low_income_data_2016.csv')